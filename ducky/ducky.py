@@ -1,54 +1,313 @@
 import argparse
 import asyncio
-from typing import Optional
-from ollama import AsyncClient
+import hashlib
+import io
+import json
+import math
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+from textwrap import dedent
+from typing import Dict, List, Optional, TextIO, Union
+
+SYSTEM_PROMPT = dedent("""
+    You are a pair programming tool to help developers debug, think through design, and write code.
+    Help the user think through their approach and provide feedback on the code. Think step by step and ask clarifying questions if needed.
+""").strip()
+DEFAULT_PROMPT = "review the code, find any issues if any, suggest cleanups if any"
+QUESTION_SUFFIX = " be as concise as possible"
+# Per-file cap for --directory input; anything bigger is almost never hand-written source.
+MAX_FILE_BYTES = 256 * 1024
+CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "ducky")
+
+_client = None
+
+
+def _get_client():
+    # One client per process so every duck, including concurrent --split reviews, shares the same
+    # connection pool instead of each opening its own.
+    global _client
+    if _client is None:
+        # ollama (httpx, pydantic) dominates startup, so it is only imported once a client is needed.
+        import httpx
+        from ollama import AsyncClient
+
+        # httpx drops idle connections after 5s by default; keep them so chained turns reuse the socket.
+        # Reads stay unbounded since model loads and long generations can take minutes.
+        _client = AsyncClient(
+            timeout=httpx.Timeout(None, connect=10.0),
+            limits=httpx.Limits(max_keepalive_connections=4, keepalive_expiry=300),
+        )
+    return _client
+
+
+async def _close_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+async def _ainput(prompt: str) -> str:
+    # input() runs on a daemon thread so the event loop (and the warm-up) keeps going while the user types.
+    # A blocking input() inside the coroutine swallows the first Ctrl-C, and the default executor is
+    # avoided too: asyncio.run waits for its threads, so Ctrl-C would hang until Enter.
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def settle(result: Optional[str], error: Optional[BaseException]) -> None:
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def read() -> None:
+        try:
+            result, error = input(prompt), None
+        except BaseException as e:
+            result, error = None, e
+        try:
+            loop.call_soon_threadsafe(settle, result, error)
+        except RuntimeError:
+            pass  # The loop already closed, e.g. after Ctrl-C.
+
+    threading.Thread(target=read, daemon=True).start()
+    return await future
+
+
+class ResponseCache:
+    # Exact-match cache: a hash of the model and the full message list maps to a reply stored on disk,
+    # so re-running the same prompt against unchanged code skips inference entirely. It is best-effort:
+    # an unreadable entry is a miss and a failed write is skipped, never an error for the user.
+    def __init__(self, directory: str = CACHE_DIR) -> None:
+        self.directory = directory
+
+    def key(self, model: str, messages: List[Dict[str, str]]) -> str:
+        payload = json.dumps([model, messages], ensure_ascii=False).encode()
+        return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        try:
+            with open(os.path.join(self.directory, key), encoding="utf-8") as f:
+                return f.read() or None
+        except (OSError, UnicodeDecodeError):
+            return None
+
+    def put(self, key: str, response: str) -> None:
+        if not response:
+            return
+        path = os.path.join(self.directory, key)
+        # Write then rename so concurrent --split reviews never see a half-written entry.
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(response)
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
 
 
 class RubberDuck:
-    def __init__(self, model: str = "codellama") -> None:
-        self.system_prompt = """You are a pair progamming tool to help developers debug, think through design, and write code. 
-        Help the user think through their approach and provide feedback on the code. Think step by step and ask clarifying questions if needed."""
-        self.client = AsyncClient()
+    def __init__(
+        self,
+        model: str = "codellama",
+        history_size: int = 16,
+        code: Optional[str] = None,
+        keep_alive: Optional[Union[str, float]] = "30m",
+        cache: Optional[ResponseCache] = None,
+    ) -> None:
+        self.system_prompt = SYSTEM_PROMPT
+        self.client = _get_client()
         self.model = model
+        # Keeps the model (and its cached prompt prefix) resident between turns instead of Ollama's 5m default;
+        # None leaves it to the server's OLLAMA_KEEP_ALIVE.
+        self.keep_alive = keep_alive
+        self.code = code
+        self.cache = cache
+        # The system messages are never rewritten, so every request shares a byte-identical prefix
+        # that Ollama can reuse from its KV cache instead of re-evaluating it each turn.
+        self.system_messages = [{"role": "system", "content": self.system_prompt}]
+        if code:
+            self.system_messages.append({"role": "system", "content": f"Reference code:\n{code}"})
+        # Only the most recent exchanges are replayed as context so each turn's prompt stays bounded;
+        # the deque drops the oldest user/assistant pair on its own once it is full.
+        self.history = deque(maxlen=2 * history_size)
+
+    async def warm_up(self) -> None:
+        # Loads the model and evaluates the system prompt and reference code (generating a single token),
+        # so the first real turn finds that prefix already in Ollama's KV cache.
+        await self.client.chat(
+            model=self.model,
+            messages=self.system_messages,
+            keep_alive=self.keep_alive,
+            options={"num_predict": 1},
+        )
 
-    async def call_llama(self, code: str = "", prompt: Optional[str] = None, chain: bool = False) -> None:
+    async def _stream_reply(self, messages: List[Dict[str, str]], out: TextIO) -> str:
+        stream = await self.client.chat(
+            model=self.model, messages=messages, stream=True, keep_alive=self.keep_alive
+        )
+        parts = []
+        last_flush = time.monotonic()
+        async for chunk in stream:
+            content = chunk['message']['content']
+            if content:
+                out.write(content)
+                parts.append(content)
+                # Flushing every token costs a syscall each; ~30 flushes a second still reads as live.
+                now = time.monotonic()
+                if now - last_flush > 0.03:
+                    out.flush()
+                    last_flush = now
+        return "".join(parts)
+
+    async def call_llama(
+        self, prompt: Optional[str] = None, chain: bool = False, out: Optional[TextIO] = None
+    ) -> None:
+        out = out or sys.stdout
+        warm_up = None
         if prompt is None:
-            user_prompt = input("\nEnter your prompt (or press Enter for default review): ")
-            if not user_prompt:
-                prompt = "review the code, find any issues if any, suggest cleanups if any:" + code
-            else:
-                prompt = user_prompt + code
-        else:
-            prompt = prompt + code
+            # Load the model while the user is typing rather than after they press Enter. With a zero
+            # keep_alive Ollama would unload it again right after the warm-up, so it is skipped.
+            if self.keep_alive != 0:
+                warm_up = asyncio.create_task(self.warm_up())
+            try:
+                user_prompt = await _ainput("\nEnter your prompt (or press Enter for default review): ")
+            except BaseException:
+                # EOF or Ctrl-C: stop the warm-up and collect its result so its error isn't reported as unretrieved.
+                if warm_up is not None:
+                    warm_up.cancel()
+                    await asyncio.gather(warm_up, return_exceptions=True)
+                raise
+            prompt = user_prompt or DEFAULT_PROMPT
 
-        responses = []
         while True:
-            # Include previous responses in the prompt for context
-            context_prompt = "\n".join(responses) + "\n" + prompt
-            stream = await self.client.generate(model=self.model, prompt=context_prompt, stream=True)
-            response_text = ""
-            async for chunk in stream:
-                if 'response' in chunk:
-                    print(chunk['response'], end='', flush=True)
-                    response_text += chunk['response']
-            print()  # New line after response completes
-            responses.append(response_text)
+            user_message = {"role": "user", "content": prompt}
+            messages = [*self.system_messages, *self.history, user_message]
+            key = self.cache.key(self.model, messages) if self.cache else None
+            response = self.cache.get(key) if self.cache else None
+            if warm_up is not None:
+                if response is None:
+                    await warm_up
+                else:
+                    # A cached answer needs no model, so don't wait for the prefill to finish.
+                    warm_up.cancel()
+                    await asyncio.gather(warm_up, return_exceptions=True)
+                warm_up = None
+            if response is None:
+                response = await self._stream_reply(messages, out)
+                if self.cache:
+                    self.cache.put(key, response)
+            else:
+                out.write(response)
+            print(file=out, flush=True)  # New line after response completes
+            self.history.extend((user_message, {"role": "assistant", "content": response}))
             if not chain:
                 break
-            prompt = input("\nAny questions? \n")
+            prompt = await _ainput("\nAny questions? \n")
 
 
-def read_files_from_dir(directory: str) -> str:
-    import os
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        data = f.read(MAX_FILE_BYTES + 1)
+    # NUL bytes never appear in source text; binaries would only burn prompt tokens.
+    if b"\0" in data[:8192]:
+        return b""
+    if len(data) > MAX_FILE_BYTES:
+        print(f"Warning: only the first {MAX_FILE_BYTES // 1024} KiB of {path} will be used", file=sys.stderr)
+        return data[:MAX_FILE_BYTES]
+    return data
 
-    files = os.listdir(directory)
-    code = ""
-    for file in files:
-        code += open(directory + "/" + file).read()
-    return code
 
+async def _read_dir(directory: str) -> Dict[str, bytes]:
+    with os.scandir(directory) as entries:
+        paths = [entry.path for entry in entries if entry.is_file() and not entry.name.startswith(".")]
+    # Reads run on the default thread pool so slow disks are waited on concurrently.
+    parts = await asyncio.gather(*(asyncio.to_thread(_read_file, path) for path in paths))
+    return {path: data for path, data in zip(paths, parts) if data}
 
-async def ducky() -> None:
+
+async def read_files_from_dir(directory: str) -> str:
+    files = await _read_dir(directory)
+    return b"".join(files.values()).decode("utf-8", errors="ignore")
+
+
+async def review_files_separately(
+    directory: str,
+    model: str,
+    prompt: Optional[str],
+    parallel: int = 4,
+    cache: Optional[ResponseCache] = None,
+    keep_alive: Optional[Union[str, float]] = "30m",
+) -> int:
+    # One request per file lets Ollama spread the prefill across its parallel slots (OLLAMA_NUM_PARALLEL)
+    # instead of evaluating a single huge prompt. Replies are buffered so files don't interleave.
+    files = await _read_dir(directory)
+    # Ollama queues anything beyond its own slots anyway, so cap in-flight requests to match.
+    semaphore = asyncio.Semaphore(parallel)
+
+    async def review(path: str, code: str) -> None:
+        async with semaphore:
+            rubber_ducky = RubberDuck(model=model, code=code, keep_alive=keep_alive, cache=cache)
+            out = io.StringIO()
+            await rubber_ducky.call_llama(prompt=prompt or DEFAULT_PROMPT, out=out)
+        print(f"\n=== {path} ===\n{out.getvalue()}", end="", flush=True)
+
+    # A failed review is reported on stderr under its own header instead of cutting the others short.
+    results = await asyncio.gather(
+        *(review(path, data.decode("utf-8", errors="ignore")) for path, data in files.items()),
+        return_exceptions=True,
+    )
+    failed = 0
+    for path, result in zip(files, results):
+        if isinstance(result, BaseException):
+            print(f"\n=== {path} ===\nError: {result}", file=sys.stderr, flush=True)
+            failed += 1
+    return failed
+
+
+def _positive_int(value: str) -> int:
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"expected a positive integer, got {value!r}")
+    return number
+
+
+def _non_negative_int(value: str) -> int:
+    try:
+        number = int(value)
+    except ValueError:
+        number = -1
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"expected a non-negative integer, got {value!r}")
+    return number
+
+
+def _keep_alive(value: str) -> Union[str, float]:
+    # Ollama reads bare numbers as seconds (negative means forever) and strings as durations like "30m".
+    try:
+        seconds = float(value)
+    except ValueError:
+        # Zero durations ("0s", "0m", ...) become 0 so RubberDuck can tell the model won't stay loaded.
+        return 0.0 if re.fullmatch(r"0+(\.0*)?(ns|us|µs|ms|s|m|h)", value) else value
+    if not math.isfinite(seconds):
+        raise argparse.ArgumentTypeError(f"expected a number of seconds or a duration like 30m, got {value!r}")
+    return seconds
+
+
+def _build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser()
     parser.add_argument("question", nargs="*", help="Direct question to ask", default=None)
     parser.add_argument("--prompt", "-p", help="Custom prompt to be used", default=None)
@@ -64,19 +323,102 @@ async def ducky() -> None:
     parser.add_argument(
         "--model", "-m", help="The model to be used", default="codellama"
     )
-    args, _ = parser.parse_known_args()
+    parser.add_argument(
+        "--split",
+        "-s",
+        help="Review each file in the directory separately and in parallel",
+        action="store_true",
+        default=False,
+    )
+    parser.add_argument(
+        "--parallel",
+        "-j",
+        help="How many files --split reviews at once (defaults to $DUCKY_PARALLEL or 4)",
+        type=_positive_int,
+        default=None,
+    )
+    parser.add_argument(
+        "--max-history",
+        help="How many previous exchanges are sent back to the model in --chain mode",
+        type=_non_negative_int,
+        default=16,
+    )
+    parser.add_argument(
+        "--keep-alive",
+        help="How long Ollama keeps the model loaded after each request, e.g. 30m, 0 or -1 "
+        "(defaults to $OLLAMA_KEEP_ALIVE or 30m)",
+        type=_keep_alive,
+        default=os.environ.get("OLLAMA_KEEP_ALIVE", "30m"),
+    )
+    parser.add_argument(
+        "--cache",
+        help="Reuse the saved answer when the exact same prompt and code were asked before",
+        action="store_true",
+        default=False,
+    )
+    return parser
+
+
+_PARSER = _build_parser()
+
+
+async def ducky() -> None:
+    args, _ = _PARSER.parse_known_args()
+    if args.split and args.directory is None:
+        _PARSER.error("--split requires --directory")
+    if args.split and args.file is not None:
+        _PARSER.error("--split cannot be combined with --file")
+    if args.split and args.chain:
+        _PARSER.error("--split cannot be combined with --chain")
+    if args.split and args.parallel is None:
+        # Read here rather than as the argparse default so a bad value only matters when it is used.
+        try:
+            args.parallel = _positive_int(os.environ.get("DUCKY_PARALLEL", "4"))
+        except argparse.ArgumentTypeError as e:
+            _PARSER.error(f"$DUCKY_PARALLEL: {e}")
+
+    try:
+        await _run(args)
+    finally:
+        # Release the pooled connection to the Ollama server.
+        await _close_client()
+
+
+async def _run(args: argparse.Namespace) -> None:
+    cache = ResponseCache() if args.cache else None
+
+    if args.split:
+        # A direct question is asked of every file, as it would be of the combined code without --split.
+        prompt = " ".join(args.question) + QUESTION_SUFFIX if args.question else args.prompt
+        failed = await review_files_separately(
+            args.directory, args.model, prompt, args.parallel, cache, args.keep_alive
+        )
+        if failed:
+            sys.exit(1)
+        return
+
+    # Handle file input
+    if args.file is not None:
+        code = open(args.file).read()
+    # Handle directory input
+    elif args.directory is not None:
+        code = await read_files_from_dir(args.directory)
+    else:
+        code = None
 
     # My testing has shown that the codellama:7b-python is good for returning python code from the program.
     # My intention with this tool was to give more general feedback and have back a back and forth with the user.
-    rubber_ducky = RubberDuck(model=args.model)
+    rubber_ducky = RubberDuck(
+        model=args.model, history_size=args.max_history, code=code, keep_alive=args.keep_alive, cache=cache
+    )
 
     # Handle direct question from CLI
-    if args.question is not None:
-        question = " ".join(args.question) + " be as concise as possible"
+    if args.question:
+        question = " ".join(args.question) + QUESTION_SUFFIX
         await rubber_ducky.call_llama(prompt=question, chain=args.chain)
         return
 
-    if args.file is None and args.directory is None:
+    if rubber_ducky.code is None:
         # Handle interactive mode (no file/directory specified)
         await rubber_ducky.call_llama(prompt=args.prompt, chain=args.chain)
         if args.chain:
@@ -84,14 +426,7 @@ async def ducky() -> None:
                 await rubber_ducky.call_llama(prompt=args.prompt, chain=args.chain)
         return
 
-    # Handle file input
-    if args.file is not None:
-        code = open(args.file).read()
-    # Handle directory input
-    else:
-        code = read_files_from_dir(args.directory)
-        
-    await rubber_ducky.call_llama(code=code, prompt=args.prompt, chain=args.chain)
+    await rubber_ducky.call_llama(prompt=args.prompt, chain=args.chain)
 
 
 def main():
@@ -16,6 +16,7 @@ setup(
     packages=find_packages(),
     install_requires=[
         'ollama',
+        'httpx',
     ],
     entry_points={
         'console_scripts': [